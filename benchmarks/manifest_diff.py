@@ -0,0 +1,57 @@
+#!/usr/bin/python
+"""
+Benchmark of comparing two manifests the size of a full run. Two manifests
+with the number of entries given (default 7,000, around the number of files a
+run creates) are written to a temporary folder with every hundredth entry
+changed. It reports the time taken to list the changes between them.
+
+Run from the repository root with:
+
+    uv run python benchmarks/manifest_diff.py [entries]
+
+"""
+
+import sys
+from os.path import join
+from time import perf_counter
+
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.dhs.manifest import Manifest
+
+
+def main(no_entries):
+    with temp_dir("ManifestDiffBenchmark") as folder:
+        previous_path = join(folder, "previous.sqlite")
+        path = join(folder, "current.sqlite")
+        for filepath, changed in ((previous_path, 0), (path, 1)):
+            with Manifest(filepath) as manifest:
+                manifest.connection.executemany(
+                    "INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (
+                            f"C{i // 30:03d}",
+                            f"Tag {i % 30 // 2}",
+                            ("national", "subnational")[i % 2],
+                            "file.csv",
+                            1000,
+                            10,
+                            "2015-01-01",
+                            "2015-12-31",
+                            str(i * changed if i % 100 == 0 else i),
+                        )
+                        for i in range(no_entries)
+                    ),
+                )
+        with Manifest(path, previous_path) as manifest:
+            start = perf_counter()
+            changes = manifest.get_changes()
+            elapsed = perf_counter() - start
+    print(
+        f"Compared {no_entries:,} manifest entries and found {len(changes):,} "
+        f"changes in {elapsed:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 7000)
@@ -0,0 +1,49 @@
+#!/usr/bin/python
+"""
+Benchmark of deriving the indicator by survey year table for a large country.
+The rows of the subnational csv in tests/fixtures are repeated to the number
+of rows given (default 100,000), spread over 30 survey years and with new
+locations every 30 repeats. It reports the time taken to pivot them, which
+should be well under a second.
+
+Run from the repository root with:
+
+    uv run python benchmarks/pivot.py [rows]
+
+"""
+
+import sys
+from os.path import join
+from time import perf_counter
+
+from hdx.utilities.dictandlist import read_list_from_csv
+
+from hdx.scraper.dhs.pivot import pivot_by_survey_year, subnational_keys
+
+
+def main(no_rows):
+    headers, *rows = read_list_from_csv(
+        join("tests", "fixtures", "DHS Quickstats_subnational_AFG.csv"), headers=1
+    )
+    year_index = headers.index("SurveyYear")
+    location_index = headers.index("Location")
+    large_rows = []
+    for i in range(no_rows // len(rows) + 1):
+        year = str(1990 + i % 30)
+        for row in rows:
+            row = list(row)
+            row[year_index] = year
+            row[location_index] = f"{row[location_index]}{i // 30}"
+            large_rows.append(row)
+    del large_rows[no_rows:]
+    start = perf_counter()
+    headers, pivoted_rows = pivot_by_survey_year(headers, large_rows, subnational_keys)
+    elapsed = perf_counter() - start
+    print(
+        f"Pivoted {len(large_rows):,} rows into {len(pivoted_rows):,} rows and "
+        f"{len(headers):,} columns in {elapsed:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
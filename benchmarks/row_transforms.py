@@ -0,0 +1,118 @@
+#!/usr/bin/python
+"""
+Micro-benchmark of the national and subnational row transforms, comparing the
+list rows used by the pipeline with the dict rows it previously used. The rows
+of the csvs in tests/fixtures are repeated to the number of rows given (default
+1,000,000). For each path, it reports rows per second when streaming rows
+through the transform and the memory held once the transformed rows are kept
+as they are when a resource is generated.
+
+Run from the repository root with:
+
+    uv run python benchmarks/row_transforms.py [rows]
+
+"""
+
+import sys
+import tracemalloc
+from itertools import cycle, islice
+from os.path import join
+from time import perf_counter
+
+from hdx.utilities.dictandlist import read_list_from_csv
+
+from hdx.scraper.dhs.pipeline import (
+    get_national_row_function,
+    get_subnational_row_function,
+)
+
+
+def get_national_dict_row_function(countryiso):
+    def process_national_row(_, row):
+        row["ISO3"] = countryiso
+        return row
+
+    return process_national_row
+
+
+def get_subnational_dict_row_function(countryiso):
+    def process_subnational_row(_, row):
+        row["ISO3"] = countryiso
+        val = row["CharacteristicLabel"]
+        if val[:2] == "..":
+            val = val[2:]
+        row["Location"] = val
+        return row
+
+    return process_subnational_row
+
+
+def dict_path(origheaders, headers, rows, row_function):
+    # What get_tabular_rows does with dict_form=True and header insertions
+    for inrow in rows:
+        row = row_function(origheaders, dict(zip(origheaders, inrow)))
+        yield {key: row[key] for key in headers}
+
+
+def list_path(origheaders, rows, row_function):
+    # What get_tabular_rows does with dict_form=False
+    for inrow in rows:
+        yield row_function(origheaders, list(inrow))
+
+
+def measure(name, no_rows, make_iterator):
+    start = perf_counter()
+    for _ in make_iterator():
+        pass
+    elapsed = perf_counter() - start
+    tracemalloc.start()
+    kept = list(make_iterator())
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    print(
+        f"{name:<20} {no_rows / elapsed:>12,.0f} rows/s {memory / no_rows:>8,.0f} bytes/row"
+    )
+
+
+def main(no_rows):
+    for filename, insertions, get_list_function, get_dict_function in (
+        (
+            "afg77national.csv",
+            ["ISO3"],
+            get_national_row_function,
+            get_national_dict_row_function,
+        ),
+        (
+            "afg0subnational.csv",
+            ["ISO3", "Location"],
+            get_subnational_row_function,
+            get_subnational_dict_row_function,
+        ),
+    ):
+        origheaders, *rows = read_list_from_csv(
+            join("tests", "fixtures", filename), headers=1
+        )
+        rows = [tuple(row) for row in rows]
+        headers = [*insertions, *origheaders]
+        print(f"{filename} repeated to {no_rows:,} rows")
+
+        def make_rows():
+            return islice(cycle(rows), no_rows)
+
+        measure(
+            "dict rows",
+            no_rows,
+            lambda: dict_path(
+                origheaders, headers, make_rows(), get_dict_function("AFG")
+            ),
+        )
+        measure(
+            "list rows",
+            no_rows,
+            lambda: list_path(origheaders, make_rows(), get_list_function("AFG")),
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -5,8 +5,9 @@ Top level script. Calls other functions that generate datasets that this script
 """
 
 import logging
+from contextlib import nullcontext
 from os import getenv
-from os.path import expanduser, join
+from os.path import expanduser, isfile, join, realpath
 
 from dateutil.parser import ParserError
 from hdx.api.configuration import Configuration
@@ -29,11 +30,13 @@ from tenacity import (
     wait_fixed,
 )
 
+from hdx.scraper.dhs.manifest import Manifest
 from hdx.scraper.dhs.pipeline import (
     generate_datasets_and_showcase,
     get_countries,
     get_tags,
 )
+from hdx.scraper.dhs.upload import create_in_hdx_with_uploads
 
 logger = logging.getLogger(__name__)
 
@@ -41,7 +44,7 @@ _LOOKUP = "hdx-scraper-dhs"
 _UPDATED_BY_SCRIPT = "HDX Scraper: DHS"
 
 
-def createdataset(dataset, info):
+def createdataset(dataset, info, max_upload_workers):
     dataset.update_from_yaml(
         path=script_dir_plus_file(
             join("config", "hdx_dataset_static.yaml"),
@@ -51,19 +54,28 @@ def createdataset(dataset, info):
     dataset["license_other"] = dataset["license_other"].replace(
         "\n", "  \n"
     )  # ensure markdown has line breaks
-    dataset.create_in_hdx(
+    create_in_hdx_with_uploads(
+        dataset,
+        max_upload_workers,
         remove_additional_resources=True,
         updated_by_script=_UPDATED_BY_SCRIPT,
         batch=info["batch"],
     )
 
 
-def main(save: bool = False, use_saved: bool = False) -> None:
+def main(
+    save: bool = False,
+    use_saved: bool = False,
+    manifest: str | None = None,
+    previous_manifest: str | None = None,
+) -> None:
     """Generate datasets and create them in HDX
 
     Args:
         save (bool): Save downloaded data. Defaults to False.
         use_saved (bool): Use saved data. Defaults to False.
+        manifest (str | None): Path of manifest of generated resources to write. Defaults to None.
+        previous_manifest (str | None): Path of manifest from a previous run. The datasets of countries unchanged since it are not updated in HDX. Defaults to None.
 
     Returns:
         None
@@ -71,6 +83,16 @@ def main(save: bool = False, use_saved: bool = False) -> None:
 
     configuration = Configuration.read()
     base_url = configuration["base_url"]
+    max_upload_workers = configuration["max_upload_workers"]
+    if previous_manifest and not isfile(previous_manifest):
+        logger.warning(f"Previous manifest {previous_manifest} does not exist!")
+        previous_manifest = None
+    if previous_manifest and not manifest:
+        raise ValueError("A manifest is needed to compare with the previous manifest!")
+    if previous_manifest and realpath(previous_manifest) == realpath(manifest):
+        raise ValueError(
+            "The manifest must be a different file to the previous manifest!"
+        )
     with wheretostart_tempdir_batch(_LOOKUP) as info:
         folder = info["folder"]
         dhs_key = getenv("APIKEY")
@@ -78,11 +100,16 @@ def main(save: bool = False, use_saved: bool = False) -> None:
             extra_params_dict = {"apiKey": dhs_key}
         else:
             extra_params_dict = None
-        with Download(
-            extra_params_dict=extra_params_dict,
-            extra_params_yaml=join(expanduser("~"), ".extraparams.yaml"),
-            extra_params_lookup=_LOOKUP,
-        ) as downloader:
+        with (
+            Download(
+                extra_params_dict=extra_params_dict,
+                extra_params_yaml=join(expanduser("~"), ".extraparams.yaml"),
+                extra_params_lookup=_LOOKUP,
+            ) as downloader,
+            (
+                Manifest(manifest, previous_manifest) if manifest else nullcontext()
+            ) as run_manifest,
+        ):
             downloader.session.mount(
                 "http://",
                 HTTPAdapter(max_retries=1, pool_connections=100, pool_maxsize=100),
@@ -114,17 +141,42 @@ def main(save: bool = False, use_saved: bool = False) -> None:
                     subdataset,
                     showcase,
                 ) = generate_datasets_and_showcase(
-                    configuration, base_url, retriever, info["folder"], country, tags
+                    configuration,
+                    base_url,
+                    retriever,
+                    info["folder"],
+                    country,
+                    tags,
+                    run_manifest,
                 )
+                update_datasets = True
+                if previous_manifest:
+                    changes = run_manifest.get_changes(country["iso3"])
+                    if changes:
+                        logger.info(
+                            f"{len(changes)} changed resources for {country['iso3']}"
+                        )
+                    else:
+                        # the publication is not in the manifest so the
+                        # showcase is still updated
+                        logger.info(
+                            f"No changes for {country['iso3']} since previous manifest"
+                        )
+                        update_datasets = False
                 if dataset:
-                    createdataset(dataset, info)
+                    if update_datasets:
+                        createdataset(dataset, info, max_upload_workers)
                     if showcase:
                         showcase.create_in_hdx()
                         showcase.add_dataset(dataset)
                 if subdataset:
-                    createdataset(subdataset, info)
+                    if update_datasets:
+                        createdataset(subdataset, info, max_upload_workers)
                     if showcase:
                         showcase.add_dataset(subdataset)
+                if run_manifest:
+                    # only record the country once it is up to date in HDX
+                    run_manifest.commit()
 
             for info, country in progress_storing_tempdir("DHS", countries, "iso3"):
                 process_country(info, country)
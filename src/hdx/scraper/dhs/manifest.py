@@ -0,0 +1,198 @@
+#!/usr/bin/python
+"""
+Manifest:
+---------
+
+Records the resources generated in a run in an SQLite database keyed by
+country, tag and breakdown so that runs can be compared without repeating
+them. Run as a module to list the differences between two manifests.
+
+"""
+
+import argparse
+import sqlite3
+from contextlib import closing
+from os.path import basename, isfile
+from pathlib import Path
+
+from hdx.utilities.file_hashing import get_size_and_hash
+
+schema = """
+CREATE TABLE IF NOT EXISTS resources (
+    iso3 TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    breakdown TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    startdate TEXT,
+    enddate TEXT,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (iso3, tag, breakdown)
+) WITHOUT ROWID
+"""
+
+diff_query = """
+SELECT new.iso3, new.tag, new.breakdown,
+    CASE WHEN old.iso3 IS NULL THEN 'added' ELSE 'changed' END
+FROM main.resources AS new
+LEFT JOIN old.resources AS old USING (iso3, tag, breakdown)
+WHERE (old.iso3 IS NULL OR old.hash != new.hash){filter_new}
+UNION ALL
+SELECT old.iso3, old.tag, old.breakdown, 'removed'
+FROM old.resources AS old
+LEFT JOIN main.resources AS new USING (iso3, tag, breakdown)
+WHERE new.iso3 IS NULL{filter_old}
+ORDER BY 1, 2, 3
+"""
+
+
+class Manifest:
+    """SQLite manifest of the resources generated in a run, optionally
+    attaching the manifest of a previous run to compare with. Use as a context
+    manager so that changes are committed and the database closed on exit.
+    Uncommitted changes are rolled back if there is an exception.
+
+    Args:
+        path (str): Path of the SQLite database to create or open
+        previous_path (Optional[str]): Path of previous manifest. Defaults to None.
+    """
+
+    def __init__(self, path, previous_path=None):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(schema)
+        if previous_path:
+            self.connection.execute("ATTACH DATABASE ? AS old", (previous_path,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        self.connection.close()
+
+    def commit(self):
+        self.connection.commit()
+
+    def clear(self, iso3):
+        """Remove the resources of a country, eg. before generating them again
+
+        Args:
+            iso3 (str): ISO3 code of country
+
+        Returns:
+            None
+        """
+        self.connection.execute("DELETE FROM resources WHERE iso3 = ?", (iso3,))
+
+    def add(self, iso3, tag, breakdown, filepath, results):
+        """Add a resource from the results of generating it
+
+        Args:
+            iso3 (str): ISO3 code of country
+            tag (str): DHS tag name
+            breakdown (str): national or subnational
+            filepath (str): Path of the generated file
+            results (dict): Results dictionary from Dataset.generate_resource
+
+        Returns:
+            None
+        """
+        size, hash = get_size_and_hash(filepath, "csv")
+        self.connection.execute(
+            "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                iso3,
+                tag,
+                breakdown,
+                basename(filepath),
+                size,
+                len(results["rows"]),
+                results["startdate"].date().isoformat(),
+                results["enddate"].date().isoformat(),
+                hash,
+            ),
+        )
+
+    def get_changes(self, iso3=None):
+        """Compare with the previous manifest, optionally for one country only
+
+        Args:
+            iso3 (Optional[str]): ISO3 code of country. Defaults to None (all countries).
+
+        Returns:
+            List[Tuple[str, str, str, str]]: (iso3, tag, breakdown, added/changed/removed)
+        """
+        return get_changes(self.connection, iso3)
+
+
+def get_changes(connection, iso3=None):
+    """Compare the manifest of a connection with the previous manifest attached
+    to it as old, optionally for one country only
+
+    Args:
+        connection (sqlite3.Connection): Connection to manifest
+        iso3 (Optional[str]): ISO3 code of country. Defaults to None (all countries).
+
+    Returns:
+        List[Tuple[str, str, str, str]]: (iso3, tag, breakdown, added/changed/removed)
+    """
+    if iso3 is None:
+        query = diff_query.format(filter_new="", filter_old="")
+        parameters = ()
+    else:
+        query = diff_query.format(
+            filter_new=" AND new.iso3 = ?", filter_old=" AND old.iso3 = ?"
+        )
+        parameters = (iso3, iso3)
+    return connection.execute(query, parameters).fetchall()
+
+
+def get_read_only_uri(path):
+    return f"{Path(path).absolute().as_uri()}?mode=ro"
+
+
+def diff_manifests(previous_path, path, iso3=None):
+    """List the resources added, changed or removed between two manifests.
+    Both manifests are opened read only.
+
+    Args:
+        previous_path (str): Path of the previous manifest
+        path (str): Path of the current manifest
+        iso3 (Optional[str]): ISO3 code of country. Defaults to None (all countries).
+
+    Returns:
+        List[Tuple[str, str, str, str]]: (iso3, tag, breakdown, added/changed/removed)
+    """
+    with closing(sqlite3.connect(get_read_only_uri(path), uri=True)) as connection:
+        connection.execute(
+            "ATTACH DATABASE ? AS old", (get_read_only_uri(previous_path),)
+        )
+        return get_changes(connection, iso3)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="List the DHS resources that differ between two manifests"
+    )
+    parser.add_argument("previous", help="Path of the previous manifest")
+    parser.add_argument("current", help="Path of the current manifest")
+    parser.add_argument("--iso3", help="Only compare this country")
+    args = parser.parse_args()
+    for path in (args.previous, args.current):
+        if not isfile(path):
+            parser.error(f"Manifest {path} does not exist!")
+    try:
+        changes = diff_manifests(args.previous, args.current, args.iso3)
+    except sqlite3.DatabaseError as ex:
+        parser.error(f"Could not compare manifests: {ex}")
+    for iso3, tag, breakdown, change in changes:
+        print(f"{iso3}\t{tag}\t{breakdown}\t{change}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ Generates API urls from the DHS website.
 """
 
 import logging
+from os.path import join
 
 from hdx.data.dataset import Dataset
 from hdx.data.showcase import Showcase
@@ -16,6 +17,14 @@ from hdx.utilities.dateparse import default_date, default_enddate
 from hdx.utilities.downloader import DownloadError
 from slugify import slugify
 
+from hdx.scraper.dhs.pivot import (
+    get_pivot_columns,
+    national_keys,
+    pivot_by_survey_year,
+    select_pivot_columns,
+    subnational_keys,
+)
+
 logger = logging.getLogger(__name__)
 
 description = "Contains data from the [DHS data portal](https://api.dhsprogram.com/). There is also a dataset containing [%s](%s) on HDX.\n\nThe DHS Program Application Programming Interface (API) provides software developers access to aggregated indicator data from The Demographic and Health Surveys (DHS) Program. The API can be used to create various applications to help analyze, visualize, explore and disseminate data on population, health, HIV, and nutrition from more than 90 countries."
@@ -77,8 +86,67 @@ def get_dataset(countryiso, tags):
     return dataset
 
 
+def get_national_row_function(countryiso):
+    def process_national_row(_, row):
+        row.insert(0, countryiso)
+        return row
+
+    return process_national_row
+
+
+def get_subnational_row_function(countryiso):
+    # the label column is resolved once per file as files can order columns
+    # differently: get_tabular_rows passes the same headers list for every row
+    label_headers = None
+    label_index = None
+
+    def process_subnational_row(headers, row):
+        nonlocal label_headers, label_index
+        if headers is not label_headers:
+            label_headers = headers
+            label_index = headers.index("CharacteristicLabel")
+        val = row[label_index]
+        if val[:2] == "..":
+            val = val[2:]
+        row[0:0] = (countryiso, val)
+        return row
+
+    return process_subnational_row
+
+
+def generate_resource(
+    dataset,
+    downloader,
+    url,
+    folder,
+    filename,
+    resourcedata,
+    header_insertions,
+    row_function,
+):
+    """Download url and generate a resource from its rows in list rather than
+    dict form. row_function is called with the headers prior to insertions and
+    each row as a list and must insert values at the header_insertions
+    positions.
+    """
+    headers, iterator = downloader.get_tabular_rows(
+        url,
+        header_insertions=header_insertions,
+        row_function=row_function,
+        format="csv",
+    )
+    return dataset.generate_resource(
+        folder,
+        filename,
+        iterator,
+        resourcedata,
+        headers,
+        yearcol=headers.index("SurveyYear"),
+    )
+
+
 def generate_datasets_and_showcase(
-    configuration, base_url, downloader, folder, country, dhstags
+    configuration, base_url, downloader, folder, country, dhstags, manifest=None
 ):
     """ """
     countryiso = country["iso3"]
@@ -114,22 +182,17 @@ def generate_datasets_and_showcase(
         configuration.get_dataset_url(slugified_name),
     )
 
-    def process_national_row(_, row):
-        row["ISO3"] = countryiso
-        return row
-
-    def process_subnational_row(_, row):
-        row["ISO3"] = countryiso
-        val = row["CharacteristicLabel"]
-        if val[:2] == "..":
-            val = val[2:]
-        row["Location"] = val
-        return row
+    process_national_row = get_national_row_function(countryiso)
+    process_subnational_row = get_subnational_row_function(countryiso)
+    if manifest:
+        manifest.clear(countryiso)
 
     earliest_startdate = default_enddate
     latest_enddate = default_date
     earliest_startdate_sn = default_enddate
     latest_enddate_sn = default_date
+    national_rows = []
+    subnational_rows = []
 
     for dhstag in dhstags:
         tagname = dhstag["TagName"].strip()
@@ -142,7 +205,8 @@ def generate_datasets_and_showcase(
         url = f"{base_url}data/{dhscountrycode}?tagids={dhstag['TagID']}&breakdown=national&perpage=10000&f=csv"
         filename = f"{tagname}_national_{countryiso}.csv"
         try:
-            success, results = dataset.download_generate_resource(
+            success, results = generate_resource(
+                dataset,
                 downloader,
                 url,
                 folder,
@@ -150,9 +214,21 @@ def generate_datasets_and_showcase(
                 resourcedata,
                 header_insertions=[(0, "ISO3")],
                 row_function=process_national_row,
-                yearcol="SurveyYear",
             )
             if success:
+                national_rows.extend(
+                    select_pivot_columns(
+                        results["headers"], results["rows"], national_keys
+                    )
+                )
+                if manifest:
+                    manifest.add(
+                        countryiso,
+                        tagname,
+                        "national",
+                        join(folder, filename),
+                        results,
+                    )
                 if earliest_startdate > results["startdate"]:
                     earliest_startdate = results["startdate"]
                 if latest_enddate < results["enddate"]:
@@ -173,7 +249,8 @@ def generate_datasets_and_showcase(
         filename = f"{tagname}_subnational_{countryiso}.csv"
         try:
             insertions = [(0, "ISO3"), (1, "Location")]
-            success, results = subdataset.download_generate_resource(
+            success, results = generate_resource(
+                subdataset,
                 downloader,
                 url,
                 folder,
@@ -181,9 +258,21 @@ def generate_datasets_and_showcase(
                 resourcedata,
                 header_insertions=insertions,
                 row_function=process_subnational_row,
-                yearcol="SurveyYear",
             )
             if success:
+                subnational_rows.extend(
+                    select_pivot_columns(
+                        results["headers"], results["rows"], subnational_keys
+                    )
+                )
+                if manifest:
+                    manifest.add(
+                        countryiso,
+                        tagname,
+                        "subnational",
+                        join(folder, filename),
+                        results,
+                    )
                 if earliest_startdate_sn > results["startdate"]:
                     earliest_startdate_sn = results["startdate"]
                 if latest_enddate_sn < results["enddate"]:
@@ -199,6 +288,33 @@ def generate_datasets_and_showcase(
                     raise ex
             else:
                 raise ex
+
+    resourcedata = {
+        "name": f"Indicators by Survey Year for {countryname}",
+        "description": "csv containing indicator values with a column per survey year",
+    }
+    if national_rows:
+        headers, rows = pivot_by_survey_year(
+            get_pivot_columns(national_keys), national_rows, national_keys
+        )
+        dataset.generate_resource(
+            folder,
+            f"indicators_by_year_national_{countryiso}.csv",
+            rows,
+            resourcedata,
+            headers,
+        )
+    if subnational_rows:
+        headers, rows = pivot_by_survey_year(
+            get_pivot_columns(subnational_keys), subnational_rows, subnational_keys
+        )
+        subdataset.generate_resource(
+            folder,
+            f"indicators_by_year_subnational_{countryiso}.csv",
+            rows,
+            resourcedata,
+            headers,
+        )
     if len(dataset.get_resources()) == 0:
         dataset = None
     if len(subdataset.get_resources()) == 0:
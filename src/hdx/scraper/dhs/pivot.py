@@ -0,0 +1,85 @@
+#!/usr/bin/python
+"""
+Pivot:
+------
+
+Derives wide indicator by survey year tables from rows already downloaded
+from the DHS API.
+
+"""
+
+from operator import itemgetter
+
+national_keys = ("ISO3", "IndicatorId", "Indicator")
+subnational_keys = ("ISO3", "Location", "IndicatorId", "Indicator")
+
+
+def get_pivot_columns(keys):
+    """Get the columns needed to pivot rows with the given keys
+
+    Args:
+        keys (Sequence[str]): Two or more columns identifying a row of the output
+
+    Returns:
+        List[str]: Key columns followed by SurveyYear, Value and IsPreferred
+    """
+    return [*keys, "SurveyYear", "Value", "IsPreferred"]
+
+
+def select_pivot_columns(headers, rows, keys):
+    """Select the columns needed to pivot rows using the headers of the file
+    they came from. Rows from files with columns in different orders can then
+    be pivoted together with the headers from get_pivot_columns.
+
+    Args:
+        headers (List[str]): Headers of rows
+        rows (Iterable[List]): Rows from the DHS API in list form
+        keys (Sequence[str]): Two or more columns identifying a row of the output
+
+    Returns:
+        List[Tuple]: Rows with only the columns from get_pivot_columns
+    """
+    get_fields = itemgetter(
+        *(headers.index(column) for column in get_pivot_columns(keys))
+    )
+    return [get_fields(row) for row in rows]
+
+
+def pivot_by_survey_year(headers, rows, keys):
+    """Pivot rows into one row per key (eg. indicator or indicator and
+    location) with a column of values for each survey year. Where more than
+    one row has the same key and survey year, the first preferred row is used
+    or the first row if none are preferred.
+
+    Args:
+        headers (List[str]): Headers of rows
+        rows (Iterable[List]): Rows from the DHS API in list form
+        keys (Sequence[str]): Two or more columns identifying a row of the output
+
+    Returns:
+        Tuple[List[str], List[List]]: (headers, rows) of the pivoted table
+    """
+    columns = get_pivot_columns(keys)
+    get_fields = itemgetter(*(headers.index(column) for column in columns))
+    no_keys = len(keys)
+    cells = {}
+    for row in rows:
+        fields = get_fields(row)
+        cell = fields[: no_keys + 1]
+        current = cells.get(cell)
+        if current is None or (current[1] != "1" and fields[-1] == "1"):
+            cells[cell] = fields[no_keys + 1 :]
+    table = {}
+    for cell, (value, _) in cells.items():
+        values = table.get(cell[:no_keys])
+        if values is None:
+            values = table[cell[:no_keys]] = {}
+        values[cell[no_keys]] = value
+    years = sorted({year for values in table.values() for year in values})
+    headers = [*keys, *years]
+    pivoted_rows = []
+    for key, values in table.items():
+        row = list(key)
+        row.extend(values.get(year, "") for year in years)
+        pivoted_rows.append(row)
+    return headers, pivoted_rows
@@ -0,0 +1,266 @@
+#!/usr/bin/python
+"""
+Upload:
+-------
+
+Creates datasets in HDX, uploading the files of their resources concurrently.
+
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from os import SEEK_END, SEEK_SET
+from os.path import basename
+from time import perf_counter
+from uuid import uuid4
+
+from ckanapi.common import prepare_action, reverse_apicontroller_action
+from hdx.api.utilities.filestore_helper import FilestoreHelper
+from hdx.data.dataset import Dataset
+from hdx.data.hdxobject import HDXError
+from hdx.utilities.file_hashing import get_size_and_hash
+
+logger = logging.getLogger(__name__)
+
+chunk_size = 65536
+upload_timeout = 600
+
+
+class MultipartStream:
+    """Iterable multipart/form-data body that reads the file in chunks rather
+    than all at once. It has a length so that requests sends a Content-Length
+    header instead of using chunked transfer encoding.
+
+    Args:
+        fields (dict): Form fields to send before the file
+        name (str): Name of the file field
+        filename (str): Filename to give the file
+        fp: Binary file object or buffer to stream
+    """
+
+    def __init__(self, fields, name, filename, fp):
+        self.boundary = uuid4().hex
+        self.fp = fp
+        head = bytearray()
+        for key, value in fields.items():
+            head.extend(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode()
+            )
+        filename = filename.replace('"', "%22")
+        head.extend(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode()
+        )
+        self.head = bytes(head)
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode()
+        fp.seek(0, SEEK_END)
+        self.filesize = fp.tell()
+        fp.seek(0, SEEK_SET)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return len(self.head) + self.filesize + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        while chunk := self.fp.read(chunk_size):
+            yield chunk
+        yield self.tail
+
+
+def upload_file(configuration, resource_id, fp, filename):
+    """Stream a file or buffer to the filestore of an existing resource
+
+    Args:
+        configuration (Configuration): HDX configuration
+        resource_id (str): Id of resource
+        fp: Binary file object or buffer to upload
+        filename (str): Filename to give the upload
+
+    Returns:
+        dict: Resource metadata returned by HDX
+    """
+    remoteckan = configuration.remoteckan()
+    url, _, headers = prepare_action(
+        "resource_patch",
+        apikey=configuration.get_api_key(),
+        files=True,
+        base_url=remoteckan.base_url,
+    )
+    url = f"{remoteckan.address.rstrip('/')}/{url}"
+    body = MultipartStream(
+        {"id": resource_id, "url_type": "upload"}, "upload", filename, fp
+    )
+    headers["Content-Type"] = body.content_type
+    headers["User-Agent"] = remoteckan.user_agent
+    # send the same basic auth credentials as Configuration.call_remoteckan
+    response = remoteckan.session.post(
+        url,
+        data=body,
+        headers=headers,
+        auth=configuration._get_credentials(),
+        allow_redirects=False,
+        timeout=upload_timeout,
+    )
+    return reverse_apicontroller_action(url, response.status_code, response.text)
+
+
+def prepare_uploads(dataset, existing_dataset=None):
+    """Detach the files from the resources of a dataset so that creating the
+    dataset in HDX only sends metadata. Files whose hash matches the resource
+    already in HDX keep their existing url and are not uploaded again unless
+    that resource was left waiting for an upload that never completed.
+
+    Args:
+        dataset (Dataset): Dataset to be created in HDX
+        existing_dataset (Optional[Dataset]): Dataset currently in HDX. Defaults to None.
+
+    Returns:
+        List[dict]: Files to upload with resource name, path, size and previous resource
+    """
+    existing_resources = {}
+    if existing_dataset:
+        for resource in existing_dataset.get_resources():
+            existing_resources[resource["name"]] = resource
+    uploads = []
+    for resource in dataset.get_resources():
+        file_to_upload = resource.get_file_to_upload()
+        if not file_to_upload:
+            continue
+        size, hash = get_size_and_hash(file_to_upload, resource.get("format", ""))
+        resource.set_file_to_upload(None)
+        resource["resource_type"] = "file.upload"
+        resource["url_type"] = "upload"
+        resource["size"] = size
+        resource["hash"] = hash
+        name = resource["name"]
+        existing_resource = existing_resources.get(name)
+        if (
+            existing_resource
+            and existing_resource.get("hash") == hash
+            # HDX returns the download url ending in the placeholder
+            and existing_resource["url"].rsplit("/", 1)[-1]
+            != FilestoreHelper.temporary_url
+        ):
+            resource["url"] = existing_resource["url"]
+            continue
+        resource["url"] = FilestoreHelper.temporary_url
+        if existing_resource:
+            previous = {
+                key: existing_resource.get(key) for key in ("url", "size", "hash")
+            }
+        else:
+            previous = None
+        uploads.append(
+            {"name": name, "path": file_to_upload, "size": size, "previous": previous}
+        )
+    return uploads
+
+
+def rollback_resource(configuration, resource_id, previous):
+    """Restore a resource whose upload failed to its previous state in HDX or
+    delete it if it did not exist before
+
+    Args:
+        configuration (Configuration): HDX configuration
+        resource_id (str): Id of resource
+        previous (Optional[dict]): Previous url, size and hash of resource
+
+    Returns:
+        None
+    """
+    if previous:
+        configuration.call_remoteckan("resource_patch", {"id": resource_id, **previous})
+    else:
+        configuration.call_remoteckan("resource_delete", {"id": resource_id})
+
+
+def upload_files(configuration, dataset, uploads, max_workers):
+    """Upload files to the resources of a dataset in HDX using a bounded pool
+    of threads. If any upload fails, the resources whose uploads failed are
+    rolled back so that no resource points at a missing file and HDXError is
+    raised.
+
+    Args:
+        configuration (Configuration): HDX configuration
+        dataset (Dataset): Dataset that has been created in HDX
+        uploads (List[dict]): Files to upload from prepare_uploads
+        max_workers (int): Maximum number of concurrent uploads
+
+    Returns:
+        None
+    """
+    if not uploads:
+        return
+    resource_ids = {
+        resource["name"]: resource["id"] for resource in dataset.get_resources()
+    }
+
+    def upload(name, path):
+        start = perf_counter()
+        with open(path, "rb") as fp:
+            upload_file(configuration, resource_ids[name], fp, basename(path))
+        return perf_counter() - start
+
+    total = len(uploads)
+    failures = []
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(upload, upload_info["name"], upload_info["path"]): (
+                upload_info
+            )
+            for upload_info in uploads
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            upload_info = futures[future]
+            name = upload_info["name"]
+            try:
+                elapsed = future.result()
+            except Exception as ex:
+                logger.error(f"Upload {i}/{total} of {name} failed: {ex}")
+                failures.append(upload_info)
+                continue
+            logger.info(
+                f"Uploaded {i}/{total}: {name} ({upload_info['size']} bytes) in {elapsed:.2f}s"
+            )
+    logger.info(
+        f"Uploaded {total - len(failures)} of {total} files for {dataset['name']} in {perf_counter() - start:.2f}s"
+    )
+    if not failures:
+        return
+    for upload_info in failures:
+        name = upload_info["name"]
+        try:
+            rollback_resource(
+                configuration, resource_ids[name], upload_info["previous"]
+            )
+        except Exception as ex:
+            logger.error(f"Rollback of {name} failed: {ex}")
+    names = ", ".join(upload_info["name"] for upload_info in failures)
+    raise HDXError(f"Failed to upload {names} for {dataset['name']}!")
+
+
+def create_in_hdx_with_uploads(dataset, max_workers, **kwargs):
+    """Create or update a dataset in HDX with its metadata only, then upload
+    the files of its resources concurrently
+
+    Args:
+        dataset (Dataset): Dataset to create in HDX
+        max_workers (int): Maximum number of concurrent uploads
+        **kwargs: Arguments to pass to Dataset.create_in_hdx
+
+    Returns:
+        dict: Status codes of resources as returned by Dataset.create_in_hdx
+    """
+    existing_dataset = Dataset.read_from_hdx(
+        dataset["name"], configuration=dataset.configuration
+    )
+    uploads = prepare_uploads(dataset, existing_dataset)
+    statuses = dataset.create_in_hdx(**kwargs)
+    upload_files(dataset.configuration, dataset, uploads, max_workers)
+    for upload_info in uploads:
+        statuses[upload_info["name"]] = 2
+    return statuses
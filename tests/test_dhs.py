@@ -16,10 +16,13 @@ from hdx.utilities.dictandlist import read_list_from_csv
 from hdx.utilities.downloader import DownloadError
 from hdx.utilities.path import temp_dir
 
+from hdx.scraper.dhs.manifest import Manifest
 from hdx.scraper.dhs.pipeline import (
     generate_datasets_and_showcase,
     get_countries,
+    get_national_row_function,
     get_publication,
+    get_subnational_row_function,
     get_tags,
 )
 
@@ -171,6 +174,11 @@ class TestDHS:
             "description": "csv containing DHS Mobile data",
             "format": "csv",
         },
+        {
+            "name": "Indicators by Survey Year for Afghanistan",
+            "description": "csv containing indicator values with a column per survey year",
+            "format": "csv",
+        },
     ]
     subdataset = {
         "name": "dhs-subnational-data-for-afghanistan",
@@ -195,7 +203,12 @@ class TestDHS:
             "name": "DHS Quickstats Data for Afghanistan",
             "description": "csv containing DHS Quickstats data",
             "format": "csv",
-        }
+        },
+        {
+            "name": "Indicators by Survey Year for Afghanistan",
+            "description": "csv containing indicator values with a column per survey year",
+            "format": "csv",
+        },
     ]
 
     @pytest.fixture(scope="function")
@@ -297,11 +310,11 @@ class TestDHS:
                     raise ex
                 if file is None:
                     raise ValueError(f"No file - url {url} was not recognised!")
-                rows = read_list_from_csv(
-                    join("tests", "fixtures", file), headers=1, dict_form=True
+                origheaders, *rows = read_list_from_csv(
+                    join("tests", "fixtures", file), headers=1
                 )
                 for row in rows:
-                    kwargs["row_function"](headers, row)
+                    kwargs["row_function"](origheaders, row)
                 return headers, rows
 
         return Download()
@@ -318,8 +331,28 @@ class TestDHS:
         publication = get_publication("http://haha/", downloader, "AF")
         assert publication == TestDHS.publications[-1]
 
+    def test_row_functions(self):
+        headers, *rows = read_list_from_csv(
+            join("tests", "fixtures", "afg0subnational.csv"), headers=1
+        )
+        process_national_row = get_national_row_function("AFG")
+        row = process_national_row(headers, list(rows[0]))
+        assert row == ["AFG", *rows[0]]
+        process_subnational_row = get_subnational_row_function("AFG")
+        row = process_subnational_row(headers, list(rows[0]))
+        assert row == ["AFG", "Kabul", *rows[0]]
+        row = process_subnational_row(headers, list(rows[1]))
+        assert row == ["AFG", "Paktika", *rows[1]]
+        reordered_headers = list(reversed(headers))
+        reordered_row = list(reversed(rows[1]))
+        row = process_subnational_row(reordered_headers, list(reordered_row))
+        assert row == ["AFG", "Paktika", *reordered_row]
+        row = process_subnational_row(headers, list(rows[0]))
+        assert row == ["AFG", "Kabul", *rows[0]]
+
     def test_generate_datasets_and_showcase(self, configuration, downloader):
         with temp_dir("DHS") as folder:
+            manifest = Manifest(join(folder, "manifest.sqlite"))
             (
                 dataset,
                 subdataset,
@@ -331,6 +364,7 @@ class TestDHS:
                 folder,
                 TestDHS.country,
                 TestDHS.tags,
+                manifest,
             )
             assert dataset == TestDHS.dataset
             resources = dataset.get_resources()
@@ -361,3 +395,44 @@ class TestDHS:
             assert_files_same(join("tests", "fixtures", file), join(folder, file))
             file = "DHS Quickstats_subnational_AFG.csv"
             assert_files_same(join("tests", "fixtures", file), join(folder, file))
+            file = "indicators_by_year_national_AFG.csv"
+            assert_files_same(join("tests", "fixtures", file), join(folder, file))
+            file = "indicators_by_year_subnational_AFG.csv"
+            assert_files_same(join("tests", "fixtures", file), join(folder, file))
+
+            entries = manifest.connection.execute(
+                "SELECT iso3, tag, breakdown, filename, size, rows, startdate, enddate FROM resources ORDER BY 1, 2, 3"
+            ).fetchall()
+            manifest.connection.close()
+            assert entries == [
+                (
+                    "AFG",
+                    "DHS Mobile",
+                    "national",
+                    "DHS Mobile_national_AFG.csv",
+                    25578,
+                    129,
+                    "2015-01-01",
+                    "2015-12-31",
+                ),
+                (
+                    "AFG",
+                    "DHS Quickstats",
+                    "national",
+                    "DHS Quickstats_national_AFG.csv",
+                    5072,
+                    25,
+                    "2015-01-01",
+                    "2015-12-31",
+                ),
+                (
+                    "AFG",
+                    "DHS Quickstats",
+                    "subnational",
+                    "DHS Quickstats_subnational_AFG.csv",
+                    23917,
+                    108,
+                    "2015-01-01",
+                    "2015-12-31",
+                ),
+            ]
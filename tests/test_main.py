@@ -0,0 +1,185 @@
+#!/usr/bin/python
+"""
+Unit tests for the top level script
+
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from os.path import join
+
+import pytest
+from hdx.api.configuration import Configuration
+from hdx.utilities.path import temp_dir
+
+import hdx.scraper.dhs.__main__ as script
+from hdx.scraper.dhs.manifest import diff_manifests
+
+
+class TestMain:
+    countries = [
+        {"iso3": "AFG", "dhscode": "AF"},
+        {"iso3": "AGO", "dhscode": "AO"},
+    ]
+    results = {
+        "rows": [["AFG"], ["AFG"]],
+        "startdate": datetime(2015, 1, 1, tzinfo=UTC),
+        "enddate": datetime(2015, 12, 31, 23, 59, 59, tzinfo=UTC),
+    }
+    national = join("tests", "fixtures", "DHS Quickstats_national_AFG.csv")
+    subnational = join("tests", "fixtures", "DHS Quickstats_subnational_AFG.csv")
+
+    @pytest.fixture(scope="function")
+    def folder(self):
+        with temp_dir("DHSMain") as folder:
+            yield folder
+
+    @pytest.fixture(scope="function")
+    def run(self, monkeypatch, folder):
+        Configuration._create(
+            hdx_site="feature",
+            user_agent="test",
+            hdx_key="12345",
+            project_config_yaml=join(
+                "src", "hdx", "scraper", "dhs", "config", "project_configuration.yaml"
+            ),
+        )
+        created = []
+        files = {}
+
+        class Session:
+            @staticmethod
+            def mount(prefix, adapter):
+                pass
+
+        class Download:
+            session = Session()
+
+            def __init__(self, **kwargs):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+        class Showcase:
+            def __init__(self, iso3):
+                self.iso3 = iso3
+
+            def create_in_hdx(self):
+                created.append(f"{self.iso3} showcase")
+
+            def add_dataset(self, dataset):
+                created.append(f"{self.iso3} showcase {dataset}")
+
+        def generate_datasets_and_showcase(
+            configuration, base_url, downloader, folder, country, tags, manifest
+        ):
+            iso3 = country["iso3"]
+            manifest.clear(iso3)
+            manifest.add(iso3, "DHS Quickstats", "national", files[iso3], self.results)
+            return f"{iso3} national", f"{iso3} subnational", Showcase(iso3)
+
+        def createdataset(dataset, info, max_upload_workers):
+            created.append(dataset)
+
+        info = {"folder": folder, "batch": "1234"}
+
+        @contextmanager
+        def wheretostart_tempdir_batch(lookup):
+            yield info
+
+        def progress_storing_tempdir(name, iterator, key):
+            for country in iterator:
+                yield info, country
+
+        monkeypatch.setattr(script, "Download", Download)
+        monkeypatch.setattr(script, "Retrieve", lambda *args: None)
+        monkeypatch.setattr(script, "get_countries", lambda *args: self.countries)
+        monkeypatch.setattr(script, "get_tags", lambda *args: [])
+        monkeypatch.setattr(
+            script, "generate_datasets_and_showcase", generate_datasets_and_showcase
+        )
+        monkeypatch.setattr(script, "createdataset", createdataset)
+        monkeypatch.setattr(
+            script, "wheretostart_tempdir_batch", wheretostart_tempdir_batch
+        )
+        monkeypatch.setattr(
+            script, "progress_storing_tempdir", progress_storing_tempdir
+        )
+
+        def run(country_files, manifest, previous_manifest=None):
+            created.clear()
+            files.update(country_files)
+            script.main(
+                manifest=join(folder, manifest),
+                previous_manifest=previous_manifest and join(folder, previous_manifest),
+            )
+            return created
+
+        yield run
+
+    def test_main(self, folder, run):
+        created = run({"AFG": self.national, "AGO": self.national}, "first.sqlite")
+        assert created == [
+            "AFG national",
+            "AFG showcase",
+            "AFG showcase AFG national",
+            "AFG subnational",
+            "AFG showcase AFG subnational",
+            "AGO national",
+            "AGO showcase",
+            "AGO showcase AGO national",
+            "AGO subnational",
+            "AGO showcase AGO subnational",
+        ]
+        created = run(
+            {"AFG": self.national, "AGO": self.subnational},
+            "second.sqlite",
+            "first.sqlite",
+        )
+        # the datasets of the unchanged country are not updated but its
+        # showcase is
+        assert created == [
+            "AFG showcase",
+            "AFG showcase AFG national",
+            "AFG showcase AFG subnational",
+            "AGO national",
+            "AGO showcase",
+            "AGO showcase AGO national",
+            "AGO subnational",
+            "AGO showcase AGO subnational",
+        ]
+        # the unchanged country is still recorded in the new manifest
+        first = join(folder, "first.sqlite")
+        second = join(folder, "second.sqlite")
+        connection = sqlite3.connect(second)
+        entries = connection.execute(
+            "SELECT iso3, filename FROM resources ORDER BY 1"
+        ).fetchall()
+        connection.close()
+        assert entries == [
+            ("AFG", "DHS Quickstats_national_AFG.csv"),
+            ("AGO", "DHS Quickstats_subnational_AFG.csv"),
+        ]
+        assert diff_manifests(first, second) == [
+            ("AGO", "DHS Quickstats", "national", "changed"),
+        ]
+        created = run(
+            {"AFG": self.national, "AGO": self.subnational},
+            "third.sqlite",
+            "second.sqlite",
+        )
+        assert created == [
+            "AFG showcase",
+            "AFG showcase AFG national",
+            "AFG showcase AFG subnational",
+            "AGO showcase",
+            "AGO showcase AGO national",
+            "AGO showcase AGO subnational",
+        ]
+        with pytest.raises(ValueError, match="different file"):
+            run({}, "second.sqlite", "./second.sqlite")
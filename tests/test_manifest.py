@@ -0,0 +1,156 @@
+#!/usr/bin/python
+"""
+Unit tests for cross-run manifest
+
+"""
+
+import sqlite3
+import sys
+from datetime import UTC, datetime
+from os.path import join
+
+import pytest
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.dhs.manifest import Manifest, diff_manifests, main
+
+
+class TestManifest:
+    results = {
+        "rows": [["AFG"], ["AFG"]],
+        "startdate": datetime(2015, 1, 1, tzinfo=UTC),
+        "enddate": datetime(2015, 12, 31, 23, 59, 59, tzinfo=UTC),
+    }
+    national = join("tests", "fixtures", "DHS Quickstats_national_AFG.csv")
+    subnational = join("tests", "fixtures", "DHS Quickstats_subnational_AFG.csv")
+
+    def test_get_changes(self):
+        with temp_dir("TestManifest", delete_on_success=True) as folder:
+            previous_path = join(folder, "previous.sqlite")
+            with Manifest(previous_path) as manifest:
+                for iso3 in ("AFG", "AGO", "ALB"):
+                    manifest.add(
+                        iso3, "DHS Quickstats", "national", self.national, self.results
+                    )
+                manifest.add(
+                    "AFG",
+                    "DHS Quickstats",
+                    "subnational",
+                    self.subnational,
+                    self.results,
+                )
+            path = join(folder, "current.sqlite")
+            with Manifest(path, previous_path) as manifest:
+                manifest.add(
+                    "AFG", "DHS Quickstats", "national", self.national, self.results
+                )
+                manifest.add(
+                    "AGO", "DHS Quickstats", "national", self.subnational, self.results
+                )
+                manifest.add(
+                    "ARM", "DHS Quickstats", "national", self.national, self.results
+                )
+                assert manifest.get_changes() == [
+                    ("AFG", "DHS Quickstats", "subnational", "removed"),
+                    ("AGO", "DHS Quickstats", "national", "changed"),
+                    ("ALB", "DHS Quickstats", "national", "removed"),
+                    ("ARM", "DHS Quickstats", "national", "added"),
+                ]
+                assert manifest.get_changes("AFG") == [
+                    ("AFG", "DHS Quickstats", "subnational", "removed"),
+                ]
+                manifest.clear("AGO")
+                manifest.add(
+                    "AGO", "DHS Quickstats", "national", self.national, self.results
+                )
+                assert manifest.get_changes("AGO") == []
+                entry = manifest.connection.execute(
+                    "SELECT filename, rows, startdate, enddate FROM resources WHERE iso3 = 'AGO'"
+                ).fetchone()
+                assert entry == (
+                    "DHS Quickstats_national_AFG.csv",
+                    2,
+                    "2015-01-01",
+                    "2015-12-31",
+                )
+            assert diff_manifests(previous_path, path, "ALB") == [
+                ("ALB", "DHS Quickstats", "national", "removed"),
+            ]
+
+    def test_get_changes_large(self):
+        with temp_dir("TestManifest", delete_on_success=True) as folder:
+            previous_path = join(folder, "previous.sqlite")
+            path = join(folder, "current.sqlite")
+            for filepath, changed in ((previous_path, 0), (path, 1)):
+                with Manifest(filepath) as manifest:
+                    manifest.connection.executemany(
+                        "INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            (
+                                f"C{i // 30:02d}",
+                                f"Tag {i % 30 // 2}",
+                                ("national", "subnational")[i % 2],
+                                "file.csv",
+                                1000,
+                                10,
+                                "2015-01-01",
+                                "2015-12-31",
+                                str(i * changed if i % 100 == 0 else i),
+                            )
+                            for i in range(7000)
+                        ),
+                    )
+            with Manifest(path, previous_path) as manifest:
+                changes = manifest.get_changes()
+            assert len(changes) == 69
+            assert {change[3] for change in changes} == {"changed"}
+
+    def test_main(self, monkeypatch, capsys):
+        with temp_dir("TestManifest", delete_on_success=True) as folder:
+            previous_path = join(folder, "previous.sqlite")
+            with Manifest(previous_path) as manifest:
+                for iso3 in ("AFG", "AGO"):
+                    manifest.add(
+                        iso3, "DHS Quickstats", "national", self.national, self.results
+                    )
+            path = join(folder, "current.sqlite")
+            with Manifest(path) as manifest:
+                manifest.add(
+                    "AFG", "DHS Quickstats", "national", self.subnational, self.results
+                )
+                manifest.add(
+                    "ARM", "DHS Mobile", "subnational", self.national, self.results
+                )
+            monkeypatch.setattr(sys, "argv", ["manifest-diff", previous_path, path])
+            main()
+            assert capsys.readouterr().out == (
+                "AFG\tDHS Quickstats\tnational\tchanged\n"
+                "AGO\tDHS Quickstats\tnational\tremoved\n"
+                "ARM\tDHS Mobile\tsubnational\tadded\n"
+            )
+            monkeypatch.setattr(
+                sys, "argv", ["manifest-diff", previous_path, path, "--iso3", "AGO"]
+            )
+            main()
+            assert capsys.readouterr().out == "AGO\tDHS Quickstats\tnational\tremoved\n"
+            missing_path = join(folder, "missing.sqlite")
+            monkeypatch.setattr(sys, "argv", ["manifest-diff", missing_path, path])
+            with pytest.raises(SystemExit):
+                main()
+            assert f"Manifest {missing_path} does not exist!" in capsys.readouterr().err
+            other_path = join(folder, "other.sqlite")
+            connection = sqlite3.connect(other_path)
+            connection.execute("CREATE TABLE other (id INTEGER)")
+            connection.close()
+            monkeypatch.setattr(
+                sys, "argv", ["manifest-diff", previous_path, other_path]
+            )
+            with pytest.raises(SystemExit):
+                main()
+            assert "no such table" in capsys.readouterr().err
+            connection = sqlite3.connect(other_path)
+            tables = connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall()
+            connection.close()
+            assert tables == [("other",)]
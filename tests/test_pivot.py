@@ -0,0 +1,113 @@
+#!/usr/bin/python
+"""
+Unit tests for derived indicator by survey year tables
+
+"""
+
+from os.path import join
+
+from hdx.utilities.dictandlist import read_list_from_csv
+
+from hdx.scraper.dhs.pivot import (
+    get_pivot_columns,
+    national_keys,
+    pivot_by_survey_year,
+    select_pivot_columns,
+    subnational_keys,
+)
+
+
+class TestPivot:
+    @staticmethod
+    def read_rows(filename):
+        headers, *rows = read_list_from_csv(
+            join("tests", "fixtures", filename), headers=1
+        )
+        return headers, rows
+
+    def test_pivot_by_survey_year(self):
+        headers = [
+            "ISO3",
+            "IndicatorId",
+            "Indicator",
+            "SurveyYear",
+            "Value",
+            "IsPreferred",
+        ]
+        rows = [
+            ["AFG", "FE_FRTR_W_TFR", "Total fertility rate 15-49", "2015", "5.3", "1"],
+            ["AFG", "FE_FRTR_W_TFR", "Total fertility rate 15-49", "2010", "5.1", "0"],
+            ["AFG", "FE_FRTR_W_TFR", "Total fertility rate 15-49", "2010", "5.2", "1"],
+            ["AFG", "FE_FRTR_W_TFR", "Total fertility rate 15-49", "2015", "9.9", "1"],
+            [
+                "AFG",
+                "FP_CUSM_W_ANY",
+                "Married women currently using any method of contraception",
+                "2010",
+                "21.8",
+                "0",
+            ],
+        ]
+        headers, pivoted_rows = pivot_by_survey_year(headers, rows, national_keys)
+        assert headers == ["ISO3", "IndicatorId", "Indicator", "2010", "2015"]
+        assert pivoted_rows == [
+            ["AFG", "FE_FRTR_W_TFR", "Total fertility rate 15-49", "5.2", "5.3"],
+            [
+                "AFG",
+                "FP_CUSM_W_ANY",
+                "Married women currently using any method of contraception",
+                "21.8",
+                "",
+            ],
+        ]
+
+    def test_pivot_subnational(self):
+        headers, rows = self.read_rows("DHS Quickstats_subnational_AFG.csv")
+        headers, pivoted_rows = pivot_by_survey_year(headers, rows, subnational_keys)
+        assert headers == ["ISO3", "Location", "IndicatorId", "Indicator", "2015"]
+        assert pivoted_rows[:2] == [
+            ["AFG", "Kabul", "FE_FRTR_W_TFR", "Total fertility rate 15-49", "4.6"],
+            ["AFG", "Paktika", "FE_FRTR_W_TFR", "Total fertility rate 15-49", "5.3"],
+        ]
+
+    def test_pivot_different_column_orders(self):
+        headers, rows = self.read_rows("DHS Quickstats_subnational_AFG.csv")
+        _, expected_rows = pivot_by_survey_year(headers, rows, subnational_keys)
+        half = len(rows) // 2
+        # second tag has its columns in reverse order
+        reversed_headers = list(reversed(headers))
+        reversed_rows = [list(reversed(row)) for row in rows[half:]]
+        selected_rows = select_pivot_columns(headers, rows[:half], subnational_keys)
+        selected_rows.extend(
+            select_pivot_columns(reversed_headers, reversed_rows, subnational_keys)
+        )
+        headers, pivoted_rows = pivot_by_survey_year(
+            get_pivot_columns(subnational_keys), selected_rows, subnational_keys
+        )
+        assert headers == ["ISO3", "Location", "IndicatorId", "Indicator", "2015"]
+        assert pivoted_rows == expected_rows
+
+    def test_pivot_large(self):
+        headers, rows = self.read_rows("DHS Quickstats_subnational_AFG.csv")
+        year_index = headers.index("SurveyYear")
+        location_index = headers.index("Location")
+        large_rows = []
+        for i in range(100000 // len(rows) + 1):
+            year = str(1990 + i % 30)
+            for row in rows:
+                row = list(row)
+                row[year_index] = year
+                row[location_index] = f"{row[location_index]}{i // 30}"
+                large_rows.append(row)
+        headers, pivoted_rows = pivot_by_survey_year(
+            headers, large_rows, subnational_keys
+        )
+        assert headers == [
+            *subnational_keys,
+            *(str(year) for year in range(1990, 2020)),
+        ]
+        _, pivoted_rows_small = pivot_by_survey_year(
+            *self.read_rows("DHS Quickstats_subnational_AFG.csv"), subnational_keys
+        )
+        no_locations = (100000 // len(rows)) // 30 + 1
+        assert len(pivoted_rows) == len(pivoted_rows_small) * no_locations
@@ -0,0 +1,342 @@
+#!/usr/bin/python
+"""
+Unit tests for concurrent resource uploads
+
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from os.path import join
+from shutil import copyfile
+
+import pytest
+from hdx.api.configuration import Configuration
+from hdx.api.utilities.filestore_helper import FilestoreHelper
+from hdx.data.dataset import Dataset
+from hdx.data.hdxobject import HDXError
+from hdx.data.resource import Resource
+from hdx.utilities.file_hashing import get_size_and_hash
+from hdx.utilities.path import temp_dir
+
+from hdx.scraper.dhs.upload import (
+    MultipartStream,
+    chunk_size,
+    create_in_hdx_with_uploads,
+    prepare_uploads,
+    upload_files,
+)
+
+
+class HDXStandIn(ThreadingHTTPServer):
+    """Local stand-in for the HDX action API that records uploads and the
+    maximum number of uploads in progress at once"""
+
+    daemon_threads = True
+
+    def __init__(self, fail_ids=()):
+        super().__init__(("127.0.0.1", 0), HDXStandInHandler)
+        self.fail_ids = fail_ids
+        self.lock = threading.Lock()
+        self.in_progress = 0
+        self.max_in_progress = 0
+        self.uploads = {}
+        self.actions = []
+        self.packages = {}
+        self.authorizations = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class HDXStandInHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def respond(self, status, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        action = self.path.rsplit("/", 1)[-1]
+        length = int(self.headers["Content-Length"])
+        content_type = self.headers["Content-Type"]
+        if content_type == "application/json":
+            data = json.loads(self.rfile.read(length))
+            with server.lock:
+                server.actions.append((action, data))
+            if action == "package_show":
+                package = server.packages.get(data["id"])
+                if package is None:
+                    self.respond(
+                        404,
+                        {
+                            "success": False,
+                            "error": {"__type": "Not Found Error", "message": ""},
+                        },
+                    )
+                else:
+                    self.respond(200, {"success": True, "result": package})
+                return
+            if action == "package_create":
+                data["id"] = "dataset-id"
+                for i, resource in enumerate(data.get("resources", [])):
+                    resource["id"] = f"id{i}"
+                    resource["package_id"] = data["id"]
+                with server.lock:
+                    server.packages[data["name"]] = data
+            self.respond(200, {"success": True, "result": data})
+            return
+        with server.lock:
+            server.in_progress += 1
+            server.max_in_progress = max(server.max_in_progress, server.in_progress)
+        try:
+            body = self.rfile.read(length)
+            time.sleep(0.1)
+        finally:
+            with server.lock:
+                server.in_progress -= 1
+        boundary = content_type.split("boundary=")[1].encode()
+        parts = body.split(b"--" + boundary)[1:-1]
+        fields = {}
+        for part in parts:
+            header, content = part.split(b"\r\n\r\n", 1)
+            name = header.split(b'name="')[1].split(b'"')[0].decode()
+            fields[name] = content[:-2]
+        resource_id = fields["id"].decode()
+        if resource_id in server.fail_ids:
+            self.respond(
+                409,
+                {
+                    "success": False,
+                    "error": {"__type": "Validation Error", "upload": ["failed"]},
+                },
+            )
+            return
+        with server.lock:
+            server.actions.append((action, resource_id))
+            server.uploads[resource_id] = fields["upload"]
+            server.authorizations.append(self.headers["Authorization"])
+        self.respond(200, {"success": True, "result": {"id": resource_id}})
+
+
+class TestUpload:
+    filenames = [
+        "DHS Quickstats_national_AFG.csv",
+        "DHS Mobile_national_AFG.csv",
+        "DHS Quickstats_subnational_AFG.csv",
+        "afg0national.csv",
+        "afg0subnational.csv",
+        "afg77national.csv",
+    ]
+
+    @pytest.fixture(scope="function")
+    def standin(self):
+        servers = []
+
+        def create(fail_ids=()):
+            server = HDXStandIn(fail_ids)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            servers.append(server)
+            Configuration._create(
+                hdx_url=server.url,
+                user_agent="test",
+                hdx_key="12345",
+                project_config_yaml=join(
+                    "tests", "config", "project_configuration.yaml"
+                ),
+            )
+            return server
+
+        yield create
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    @staticmethod
+    def get_dataset():
+        dataset = Dataset({"name": "dhs-data-for-afghanistan"})
+        for i, filename in enumerate(TestUpload.filenames):
+            dataset.add_update_resource(
+                Resource({"id": f"id{i}", "name": filename, "format": "csv"})
+            )
+        return dataset
+
+    @staticmethod
+    def get_uploads(folder):
+        uploads = []
+        for filename in TestUpload.filenames:
+            path = join(folder, filename)
+            copyfile(join("tests", "fixtures", filename), path)
+            uploads.append(
+                {"name": filename, "path": path, "size": 0, "previous": None}
+            )
+        return uploads
+
+    def test_multipart_stream(self):
+        reads = []
+
+        class Buffer(BytesIO):
+            def read(self, size=-1):
+                data = super().read(size)
+                reads.append((size, len(data)))
+                return data
+
+        data = bytes(range(256)) * (chunk_size * 5 // 512)
+        body = MultipartStream({"id": "id0"}, "upload", "file.csv", Buffer(data))
+        parts = list(body)
+        assert reads == [
+            (chunk_size, chunk_size),
+            (chunk_size, chunk_size),
+            (chunk_size, chunk_size // 2),
+            (chunk_size, 0),
+        ]
+        assert parts[1:-1] == [
+            data[:chunk_size],
+            data[chunk_size : chunk_size * 2],
+            data[chunk_size * 2 :],
+        ]
+        sent = b"".join(parts)
+        assert len(body) == len(sent)
+        assert body.content_type == f"multipart/form-data; boundary={body.boundary}"
+        assert sent.startswith(
+            f'--{body.boundary}\r\nContent-Disposition: form-data; name="id"\r\n\r\nid0\r\n'.encode()
+        )
+        assert sent.endswith(data + f"\r\n--{body.boundary}--\r\n".encode())
+
+    def test_create_in_hdx_with_uploads(self, standin):
+        server = standin()
+        configuration = Configuration.read()
+        configuration._get_credentials = lambda: ("user", "pass")
+        dataset = Dataset({"name": "dhs-data-for-afghanistan", "title": "DHS"})
+        for filename in self.filenames[:3]:
+            resource = Resource(
+                {"name": filename, "format": "csv", "description": filename}
+            )
+            resource.set_file_to_upload(join("tests", "fixtures", filename))
+            dataset.add_update_resource(resource)
+        statuses = create_in_hdx_with_uploads(dataset, 2, ignore_check=True)
+        assert statuses == {filename: 2 for filename in self.filenames[:3]}
+        actions = [action for action, _ in server.actions]
+        assert actions.index("package_create") < actions.index("resource_patch")
+        package = server.packages["dhs-data-for-afghanistan"]
+        for resource in package["resources"]:
+            assert resource["url"] == FilestoreHelper.temporary_url
+        assert server.max_in_progress == 2
+        for i, filename in enumerate(self.filenames[:3]):
+            with open(join("tests", "fixtures", filename), "rb") as fp:
+                assert server.uploads[f"id{i}"] == fp.read()
+        assert set(server.authorizations) == {"Basic dXNlcjpwYXNz"}
+
+    def test_prepare_uploads(self, standin):
+        standin()
+        with temp_dir("DHSUpload") as folder:
+            dataset = Dataset({"name": "dhs-data-for-afghanistan"})
+            existing_dataset = Dataset({"name": "dhs-data-for-afghanistan"})
+            for i, filename in enumerate(self.filenames[:3]):
+                path = join(folder, filename)
+                copyfile(join("tests", "fixtures", filename), path)
+                resource = Resource({"name": filename, "format": "csv"})
+                resource.set_file_to_upload(path)
+                dataset.add_update_resource(resource)
+                size, hash = get_size_and_hash(path, "csv")
+                if i == 0:
+                    hash = "changed"
+                elif i == 2:
+                    continue
+                existing_dataset.add_update_resource(
+                    Resource(
+                        {
+                            "id": f"id{i}",
+                            "name": filename,
+                            "url": f"http://old/{filename}",
+                            "format": "csv",
+                            "size": size,
+                            "hash": hash,
+                        }
+                    )
+                )
+            uploads = prepare_uploads(dataset, existing_dataset)
+            assert [upload["name"] for upload in uploads] == [
+                self.filenames[0],
+                self.filenames[2],
+            ]
+            assert uploads[0]["previous"]["url"] == f"http://old/{self.filenames[0]}"
+            assert uploads[1]["previous"] is None
+            resources = dataset.get_resources()
+            for resource in resources:
+                assert resource.get_file_to_upload() is None
+                assert resource["url_type"] == "upload"
+            assert resources[0]["url"] == FilestoreHelper.temporary_url
+            assert resources[1]["url"] == f"http://old/{self.filenames[1]}"
+            assert resources[2]["url"] == FilestoreHelper.temporary_url
+
+    def test_prepare_uploads_incomplete(self, standin):
+        standin()
+        with temp_dir("DHSUpload") as folder:
+            filename = self.filenames[0]
+            path = join(folder, filename)
+            copyfile(join("tests", "fixtures", filename), path)
+            dataset = Dataset({"name": "dhs-data-for-afghanistan"})
+            resource = Resource({"name": filename, "format": "csv"})
+            resource.set_file_to_upload(path)
+            dataset.add_update_resource(resource)
+            size, hash = get_size_and_hash(path, "csv")
+            existing_dataset = Dataset({"name": "dhs-data-for-afghanistan"})
+            existing_dataset.add_update_resource(
+                Resource(
+                    {
+                        "id": "id0",
+                        "name": filename,
+                        "url": f"https://data.humdata.org/dataset/dataset-id/resource/id0/download/{FilestoreHelper.temporary_url}",
+                        "format": "csv",
+                        "size": size,
+                        "hash": hash,
+                    }
+                )
+            )
+            uploads = prepare_uploads(dataset, existing_dataset)
+            assert [upload["name"] for upload in uploads] == [filename]
+            assert uploads[0]["path"] == path
+            assert dataset.get_resources()[0]["url"] == FilestoreHelper.temporary_url
+
+    def test_upload_files(self, standin):
+        server = standin()
+        configuration = Configuration.read()
+        dataset = self.get_dataset()
+        with temp_dir("DHSUpload") as folder:
+            uploads = self.get_uploads(folder)
+            upload_files(configuration, dataset, uploads, 3)
+            assert 1 < server.max_in_progress <= 3
+            assert len(server.uploads) == len(self.filenames)
+            for i, filename in enumerate(self.filenames):
+                with open(join("tests", "fixtures", filename), "rb") as fp:
+                    assert server.uploads[f"id{i}"] == fp.read()
+
+    def test_upload_files_failure(self, standin):
+        server = standin(fail_ids=("id1", "id4"))
+        configuration = Configuration.read()
+        dataset = self.get_dataset()
+        with temp_dir("DHSUpload") as folder:
+            uploads = self.get_uploads(folder)
+            previous = {"url": "http://old/file.csv", "size": 10, "hash": "abc"}
+            uploads[1]["previous"] = previous
+            with pytest.raises(HDXError):
+                upload_files(configuration, dataset, uploads, 2)
+            assert server.max_in_progress == 2
+            assert len(server.uploads) == len(self.filenames) - 2
+            rollbacks = [
+                action for action in server.actions if isinstance(action[1], dict)
+            ]
+            assert sorted(rollbacks, key=lambda x: x[1]["id"]) == [
+                ("resource_patch", {"id": "id1", **previous}),
+                ("resource_delete", {"id": "id4"}),
+            ]